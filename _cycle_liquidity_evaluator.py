@@ -0,0 +1,151 @@
+# The openexchange script ends with "we could improve the code so that it prints the arbitrage amount".
+# A cycle found by arbitrage() only says the quoted rates multiply to more than 1.
+# In a real market every rate is a ladder of levels with finite size, so a big trade walks the book
+# and gets worse rates. This script evaluates cycles against those ladders.
+#
+# All cycles, legs and levels are packed into padded numpy arrays, so hundreds of cycles
+# and many trade sizes are evaluated together without looping over the levels in python.
+
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+
+import numpy as np
+
+# depth ladder of one edge: (rate, size) levels, size is in units of the currency we sell
+Ladder = List[Tuple[float, float]]
+
+
+class CycleEvaluation(NamedTuple):
+    realized: np.ndarray           # (cycles, notionals) money back at the end, nan if the book is too thin
+    slippage: np.ndarray           # (cycles, notionals) fraction lost against the top of book rates
+    max_profitable_size: np.ndarray  # (cycles,) largest notional that still ends with a profit
+
+
+def build_ladders(cycles: List[List[int]], depth: Dict[Tuple[int, int], Ladder]) -> Tuple[np.ndarray, np.ndarray]:
+    ''' Padded (cycles, legs, levels) arrays of rates and sizes, best rate first.
+    Shorter cycles are padded with free legs (rate 1, unlimited size), shorter ladders with empty levels.'''
+
+    for path in cycles:
+        for leg in range(len(path) - 1):
+            if (path[leg], path[leg + 1]) not in depth:
+                raise ValueError(f"No depth ladder for the leg {path[leg]} -> {path[leg + 1]}")
+
+    num_legs = max((len(path) - 1 for path in cycles), default=1)
+    num_levels = max((len(depth[(path[i], path[i + 1])]) for path in cycles for i in range(len(path) - 1)), default=1)
+    num_levels = max(1, num_levels)
+
+    rates = np.zeros((len(cycles), num_legs, num_levels))
+    sizes = np.zeros((len(cycles), num_legs, num_levels))
+    rates[:, :, 0] = 1
+    sizes[:, :, 0] = np.inf
+
+    for c, path in enumerate(cycles):
+        for leg in range(len(path) - 1):
+            ladder = np.asarray(depth[(path[leg], path[leg + 1])], dtype=np.float64).reshape(-1, 2)
+            rates[c, leg, 0], sizes[c, leg, 0] = 0, 0
+            rates[c, leg, :len(ladder)] = ladder[:, 0]
+            sizes[c, leg, :len(ladder)] = ladder[:, 1]
+
+    order = np.argsort(-rates, axis=2, kind='stable')
+    return np.take_along_axis(rates, order, axis=2), np.take_along_axis(sizes, order, axis=2)
+
+
+def walk_cycles(rates: np.ndarray, sizes: np.ndarray, amounts: np.ndarray) -> np.ndarray:
+    ''' Money left after sending `amounts` (cycles, notionals) around every cycle, nan if a leg runs out of depth'''
+
+    amounts = np.asarray(amounts, dtype=np.float64)
+    # start of every level on the ladder, in the currency we sell
+    level_start = np.zeros_like(sizes)
+    level_start[:, :, 1:] = np.cumsum(sizes[:, :, :-1], axis=2)
+    total_depth = sizes.sum(axis=2)
+
+    for leg in range(rates.shape[1]):
+        # part of the amount that falls into each level, then converted at that level's rate
+        filled = np.clip(amounts[:, :, None] - level_start[:, leg, None, :], 0, sizes[:, leg, None, :])
+        converted = (filled * rates[:, leg, None, :]).sum(axis=2)
+        amounts = np.where(amounts <= total_depth[:, leg, None], converted, np.nan)
+
+    return amounts
+
+
+def max_profitable_size(rates: np.ndarray, sizes: np.ndarray, iterations: int = 100) -> np.ndarray:
+    ''' Largest starting amount for which every cycle still ends with more money than it started with.'''
+
+    # each leg is concave in the amount, so profit(x) = walk(x) - x is concave with profit(0) = 0.
+    # the profitable sizes are therefore one interval starting at 0 and bisection finds its end for all cycles at once
+    top_of_book = rates[:, :, 0].prod(axis=1)
+    low = np.zeros(len(rates))
+    high = sizes[:, 0, :].sum(axis=1)
+    high = np.where(np.isfinite(high), high, 1e18)
+
+    for _ in range(iterations):
+        middle = (low + high) / 2
+        back = walk_cycles(rates, sizes, middle[:, None])[:, 0]
+        profitable = back > middle
+        low = np.where(profitable, middle, low)
+        high = np.where(profitable, high, middle)
+
+    return np.where(top_of_book > 1, low, 0.0)
+
+
+def evaluate_cycles(cycles: List[List[int]], depth: Dict[Tuple[int, int], Ladder],
+                    notionals: Sequence[float]) -> CycleEvaluation:
+    ''' Realized output, slippage and maximum profitable size of every cycle for every notional'''
+
+    notionals = np.asarray(notionals, dtype=np.float64)
+    if not cycles:
+        # arbitrage() found nothing, so there is nothing to evaluate
+        return CycleEvaluation(np.empty((0, len(notionals))), np.empty((0, len(notionals))), np.empty(0))
+
+    rates, sizes = build_ladders(cycles, depth)
+    amounts = np.broadcast_to(notionals, (len(cycles), len(notionals)))
+
+    realized = walk_cycles(rates, sizes, amounts)
+    top_of_book = amounts * rates[:, :, 0].prod(axis=1)[:, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slippage = 1 - realized / top_of_book
+    # nothing sent around (notional 0) means nothing lost, a book too thin stays nan
+    slippage = np.where((top_of_book == 0) & ~np.isnan(realized), 0.0, slippage)
+
+    return CycleEvaluation(realized, slippage, max_profitable_size(rates, sizes))
+
+
+def print_evaluation(currency_tuple: tuple, cycles: List[List[int]], notionals: Sequence[float],
+                     evaluation: CycleEvaluation):
+    ''' Prints the cycles ranked by the best profit over the notionals, and what each notional turns into'''
+
+    if not cycles:
+        return
+
+    profit = evaluation.realized - np.asarray(notionals)[None, :]
+    # a notional the book can't fill doesn't count, a cycle that can't fill any of them goes last
+    best_profit = np.nan_to_num(np.fmax.reduce(profit, axis=1), nan=-np.inf)
+    ranking = np.argsort(-best_profit, kind='stable')
+
+    for c in ranking:
+        print(f"{' --> '.join([currency_tuple[p] for p in cycles[c]])} "
+              f"(max profitable size {evaluation.max_profitable_size[c]:,.2f})")
+        for i, notional in enumerate(notionals):
+            print(f"    {notional:>12,.2f} -> {evaluation.realized[c, i]:>12,.2f}"
+                  f"  slippage {evaluation.slippage[c, i]:.4%}")
+
+
+if __name__ == "__main__":
+    # same currencies as "arbitrage example 2.py", EUR --> INR --> EUR is what max_profit_cycle() finds there
+    currencies = ('PLN', 'EUR', 'USD', 'RUB', 'INR', 'MXN')
+    cycles = [[1, 4, 1], [0, 2, 3, 0], [2, 4, 5, 2]]
+
+    # made up order books: the quoted rate for a small size, then worse rates further down
+    depth = {
+        (1, 4): [(79.09, 3_000), (78.80, 5_000), (78.20, 20_000)],
+        (4, 1): [(0.013, 250_000), (0.01265, 500_000)],
+        (0, 2): [(0.25, 40_000), (0.248, 100_000)],
+        (2, 3): [(64.52, 8_000), (64.10, 15_000), (63.00, 50_000)],
+        (3, 0): [(0.061, 500_000), (0.0605, 1_000_000), (0.0595, 3_000_000)],
+        (2, 4): [(71.48, 5_000), (71.00, 10_000)],
+        (4, 5): [(0.27, 300_000), (0.268, 700_000)],
+        (5, 2): [(0.052, 100_000), (0.0515, 200_000)],
+    }
+
+    notionals = [1_000, 10_000, 50_000]
+    evaluation = evaluate_cycles(cycles, depth, notionals)
+    print_evaluation(currencies, cycles, notionals, evaluation)
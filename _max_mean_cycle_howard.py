@@ -0,0 +1,217 @@
+# Bellman-Ford returns whichever negative cycle the predecessor walk hits first.
+# That is usually a long loop that is barely profitable once fees are paid.
+# Here we look for the cycle with the best return PER LEG instead, which is the
+# minimum mean-weight cycle of the -log(rate) graph.
+#
+# howard_min_mean_cycle -> Howard's policy iteration, a few vectorized sweeps in practice
+# karp_min_mean_cycle   -> Karp's algorithm, exact O(N^3) reference to check Howard against
+
+from typing import Tuple, List, Optional
+import math
+import time
+
+import numpy as np
+
+
+def negate_logarithm_matrix(rates_matrix: Tuple[Tuple[float, ...]]) -> np.ndarray:
+    ''' -log of every rate as a numpy matrix, missing rates and self loops become inf'''
+
+    rates = np.asarray(rates_matrix, dtype=np.float64)
+    weights = np.full(rates.shape, np.inf)
+    np.negative(np.log(rates, where=rates > 0, out=weights), where=rates > 0, out=weights)
+    np.fill_diagonal(weights, np.inf)
+    return weights
+
+
+def _prune_dead_ends(weights: np.ndarray) -> np.ndarray:
+    ''' indices of the currencies that can still reach a cycle (every node needs an out edge)'''
+
+    finite = np.isfinite(weights)
+    alive = np.ones(len(weights), dtype=bool)
+    while True:
+        still_alive = alive & (finite & alive[None, :]).any(axis=1)
+        if (still_alive == alive).all():
+            return np.flatnonzero(alive)
+        alive = still_alive
+
+
+def _evaluate_policy(policy: np.ndarray, edge_weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    ''' cycle mean (eta), relative value (x) and cycle representative of every node under a policy'''
+
+    # every node follows exactly one edge, so following it long enough always ends up on a cycle.
+    # pointer doubling does all these walks at once in log2(N) array steps instead of a python loop.
+    n = len(policy)
+    rounds = max(1, math.ceil(math.log2(n)) + 1)
+
+    jump = policy.copy()
+    lowest = np.arange(n)
+    for _ in range(rounds):
+        lowest = np.minimum(lowest, lowest[jump])
+        jump = jump[jump]
+
+    # after >= N steps everybody sits on a cycle, and only cycle nodes can be landed on
+    on_cycle = np.zeros(n, dtype=bool)
+    on_cycle[jump] = True
+    # the smallest index on each cycle names it
+    representative = lowest[jump]
+
+    cycle_nodes = np.flatnonzero(on_cycle)
+    cycle_weight = np.bincount(representative[cycle_nodes], weights=edge_weights[cycle_nodes], minlength=n)
+    cycle_length = np.bincount(representative[cycle_nodes], minlength=n)
+    eta = cycle_weight[representative] / cycle_length[representative]
+
+    # x[v] = w(v, policy[v]) - eta + x[policy[v]], anchored at x[representative] = 0
+    is_representative = representative == np.arange(n)
+    jump = np.where(is_representative, np.arange(n), policy)
+    x = np.where(is_representative, 0.0, edge_weights - eta)
+    for _ in range(rounds):
+        x = x + x[jump]
+        jump = jump[jump]
+
+    return eta, x, representative
+
+
+def howard_min_mean_cycle(weights: np.ndarray, epsilon: float = 1e-12,
+                          max_iterations: int = 1000) -> Tuple[float, List[int]]:
+    ''' Minimum mean-weight cycle by Howard's policy iteration.
+    Returns (mean weight, cycle path as indices with the start repeated at the end),
+    raises RuntimeError if the policy is still changing after max_iterations sweeps.'''
+
+    weights = np.asarray(weights, dtype=np.float64)
+    nodes = _prune_dead_ends(weights)
+    if len(nodes) == 0:
+        return float('inf'), []
+    sub = weights[np.ix_(nodes, nodes)]
+    finite = np.isfinite(sub)
+    rows = np.arange(len(nodes))
+
+    # start from the single cheapest out edge of every currency
+    policy = np.argmin(sub, axis=1)
+
+    for _ in range(max_iterations):
+        edge_weights = sub[rows, policy]
+        eta, x, representative = _evaluate_policy(policy, edge_weights)
+
+        # 1) move towards a successor whose cycle has a lower mean
+        succ_eta = np.where(finite, eta[None, :], np.inf)
+        best_eta = succ_eta.min(axis=1)
+        same_best = succ_eta <= best_eta[:, None] + epsilon
+        towards_eta = np.argmin(np.where(same_best, sub + x[None, :], np.inf), axis=1)
+        improve_eta = best_eta < eta - epsilon
+
+        # 2) otherwise, within the same mean, move to a smaller relative value
+        same_class = finite & (succ_eta <= eta[:, None] + epsilon)
+        candidate = np.where(same_class, sub - eta[:, None] + x[None, :], np.inf)
+        towards_x = np.argmin(candidate, axis=1)
+        improve_x = ~improve_eta & (candidate[rows, towards_x] < x - epsilon)
+
+        if not (improve_eta.any() or improve_x.any()):
+            break
+        policy = np.where(improve_eta, towards_eta, np.where(improve_x, towards_x, policy))
+    else:
+        # the last policy is not known to be optimal, don't pass its cycle off as the best one
+        raise RuntimeError(f"Howard's policy iteration did not converge in {max_iterations} iterations")
+
+    start = representative[np.argmin(eta)]
+    cycle_path = [start]
+    node = policy[start]
+    while node != start:
+        cycle_path.append(node)
+        node = policy[node]
+    cycle_path.append(start)
+
+    return float(eta[start]), [int(nodes[p]) for p in cycle_path]
+
+
+def karp_min_mean_cycle(weights: np.ndarray) -> Tuple[float, List[int]]:
+    ''' Minimum mean-weight cycle by Karp's algorithm, exact but O(N^3) time and O(N^2) memory.
+    Returns (mean weight, cycle path as indices with the start repeated at the end).'''
+
+    weights = np.asarray(weights, dtype=np.float64)
+    n = len(weights)
+    if n == 0:
+        return float('inf'), []
+
+    # walks[k][v] = cheapest walk of exactly k edges ending in v, starting anywhere
+    walks = np.full((n + 1, n), np.inf)
+    pre = np.full((n + 1, n), -1, dtype=np.int64)
+    walks[0] = 0
+    for k in range(1, n + 1):
+        candidate = walks[k - 1][:, None] + weights
+        pre[k] = np.argmin(candidate, axis=0)
+        walks[k] = candidate[pre[k], np.arange(n)]
+
+    with np.errstate(invalid='ignore'):
+        ratios = (walks[n][None, :] - walks[:n]) / (n - np.arange(n))[:, None]
+    ratios[~np.isfinite(walks[:n])] = -np.inf
+    worst = ratios.max(axis=0)
+    worst[~np.isfinite(walks[n])] = np.inf
+    end = int(np.argmin(worst))
+    if not np.isfinite(worst[end]):
+        return float('inf'), []
+
+    # the N edge walk into `end` has to repeat a currency, and that loop is a minimum mean cycle
+    walk = [end]
+    for k in range(n, 0, -1):
+        walk.append(int(pre[k][walk[-1]]))
+    walk = walk[::-1]
+    seen = {}
+    for i, node in enumerate(walk):
+        if node in seen:
+            cycle_path = walk[seen[node]:i + 1]
+            break
+        seen[node] = i
+
+    mean = sum(weights[cycle_path[i], cycle_path[i + 1]] for i in range(len(cycle_path) - 1)) / (len(cycle_path) - 1)
+    return float(mean), cycle_path
+
+
+def max_profit_cycle(currency_tuple: tuple, rates_matrix: Tuple[Tuple[float, ...]],
+                     method: str = 'howard') -> Optional[Tuple[List[int], float]]:
+    ''' Most profitable cycle per leg. Returns (cycle path, return per leg) or None if there is no arbitrage'''
+
+    solvers = {'howard': howard_min_mean_cycle, 'karp': karp_min_mean_cycle}
+    if method not in solvers:
+        raise ValueError(f"Unknown method {method!r}, use one of {sorted(solvers)}")
+
+    mean, cycle_path = solvers[method](negate_logarithm_matrix(rates_matrix))
+    if not cycle_path or mean >= 0:
+        return None
+
+    # mean is -log(rate) per leg, so every leg multiplies the money by exp(-mean)
+    per_leg_return = math.exp(-mean) - 1
+    print(f"Best Arbitrage Per Leg ({per_leg_return:.4%}): \n{' --> '.join([currency_tuple[p] for p in cycle_path])}")
+    return cycle_path, per_leg_return
+
+
+if __name__ == "__main__":
+    # same rates as in "arbitrage example 2.py"
+    rates = [
+        [1, 0.23, 0.25, 16.43, 18.21, 4.94],
+        [4.34, 1, 1.11, 71.40, 79.09, 21.44],
+        [3.93, 0.90, 1, 64.52, 71.48, 19.37],
+        [0.061, 0.014, 0.015, 1, 1.11, 0.30],
+        [0.055, 0.013, 0.014, 0.90, 1, 0.27],
+        [0.20, 0.047, 0.052, 3.33, 3.69, 1],
+    ]
+    currencies = ('PLN', 'EUR', 'USD', 'RUB', 'INR', 'MXN')
+    max_profit_cycle(currencies, rates, method='howard')
+    max_profit_cycle(currencies, rates, method='karp')
+
+    # a bigger random market to see how both of them scale
+    num_currencies = 300
+    rng = np.random.default_rng(0)
+    values = rng.uniform(0.5, 2, num_currencies)
+    noise = rng.uniform(0.995, 1.002, (num_currencies, num_currencies))
+    random_weights = negate_logarithm_matrix(values[None, :] / values[:, None] * noise)
+
+    start_time = time.time()
+    howard_mean, _ = howard_min_mean_cycle(random_weights)
+    howard_time = time.time() - start_time
+
+    start_time = time.time()
+    karp_mean, _ = karp_min_mean_cycle(random_weights)
+    karp_time = time.time() - start_time
+
+    print(f"Howard: {howard_mean:.10f} in {howard_time:.6f} seconds")
+    print(f"Karp:   {karp_mean:.10f} in {karp_time:.6f} seconds")
@@ -0,0 +1,192 @@
+# Every detector in this repo compares raw float sums of -log(rate), for example
+# min_dist[dest_curr] > min_dist[source_curr] + trans_graph[source_curr][dest_curr].
+# On near parity markets (exchange_rates3 in _arbitrage_example_1.py) rounding noise alone
+# can look like a tiny negative cycle. Nobody can trade a 1e-15 profit anyway, so here the
+# threshold is a profit in basis points for the whole cycle: a cycle is only reported if going once
+# around it makes at least threshold_bps, computed in float64 from the raw rates.
+# The relaxations themselves only ignore improvements within the rounding noise of the kernel,
+# so a cycle made of many small legs is still found even if no single leg beats the threshold.
+# A cycle under the threshold can take over the predecessor chain and hide a better one next to it,
+# so its worst edge is dropped and the passes run again until only cycles above the threshold are left.
+#
+# The weights can be kept in one of three kernels:
+# 'float64' -> same as the other scripts
+# 'float32' -> half the memory traffic but approximate: the distances grow over the passes and the
+#              rounding noise grows with them, so it can miss small cycles the other kernels find
+# 'int64'   -> fixed point, -log(rate) in units of 1e-9, integer sums are exact and deterministic (default)
+
+from typing import Tuple, List
+import math
+import time
+
+import numpy as np
+
+KERNELS = ('float64', 'float32', 'int64')
+FIXED_POINT_SCALE = 10 ** 9
+# "no edge" for the int64 kernel, far from overflowing when a distance is added to it
+INT_INF = 2 ** 62
+
+
+def weight_matrix(rates_matrix: Tuple[Tuple[float, ...]], kernel: str = 'float32') -> np.ndarray:
+    ''' -log of every rate stored in the given kernel, missing rates and self loops become "no edge"'''
+
+    if kernel not in KERNELS:
+        raise ValueError(f"Unknown kernel {kernel!r}, use one of {KERNELS}")
+
+    rates = np.asarray(rates_matrix, dtype=np.float64)
+    has_edge = rates > 0
+    np.fill_diagonal(has_edge, False)
+    weights = -np.log(np.where(has_edge, rates, 1.0))
+
+    if kernel == 'int64':
+        return np.where(has_edge, np.rint(weights * FIXED_POINT_SCALE), INT_INF).astype(np.int64)
+    return np.where(has_edge, weights, np.inf).astype(kernel)
+
+
+def noise_weight(weights: np.ndarray, min_dist: np.ndarray):
+    ''' Smallest improvement each relaxation must make to count: a few ulps of the numbers being added
+    for floats, nothing for int64'''
+
+    if weights.dtype == np.int64:
+        return np.int64(0)
+    finite = weights[np.isfinite(weights)]
+    largest = float(np.abs(finite).max()) if finite.size else 0.0
+    return (8 * np.finfo(weights.dtype).eps * (np.abs(min_dist) + max(1.0, largest))).astype(weights.dtype)
+
+
+def cycle_profit_bps(rates_matrix: Tuple[Tuple[float, ...]], cycle_path: List[int]) -> float:
+    ''' Profit of going once around the cycle, in basis points, computed in float64 from the raw rates'''
+
+    rates = np.asarray(rates_matrix, dtype=np.float64)
+    legs = rates[cycle_path[:-1], cycle_path[1:]]
+    return math.expm1(math.fsum(np.log(legs))) * 10_000
+
+
+def negative_cycles(weights: np.ndarray) -> List[List[int]]:
+    ''' Bellman-Ford over the whole matrix at once, ignoring improvements within the kernel's rounding noise.
+    Returns the cycles the predecessor chains of the last pass run into, each starting at its lowest index.'''
+
+    n = len(weights)
+    columns = np.arange(n)
+
+    # every currency starts at 0, the same as one virtual source with a free edge into each of them
+    min_dist = np.zeros(n, dtype=weights.dtype)
+    pre = np.full(n, -1)
+
+    def relax():
+        candidate = min_dist[:, None] + weights
+        best = np.argmin(candidate, axis=0)
+        improved = candidate[best, columns] < min_dist - noise_weight(weights, min_dist)
+        return best, candidate[best, columns], improved
+
+    for _ in range(n - 1):
+        best, new_dist, improved = relax()
+        if not improved.any():
+            # nothing moved by more than the noise, no need for the remaining passes
+            break
+        min_dist = np.where(improved, new_dist, min_dist)
+        pre = np.where(improved, best, pre)
+
+    best, _, improved = relax()
+    pre = np.where(improved, best, pre)
+
+    cycles = []
+    for dest_curr in np.flatnonzero(improved):
+        # walking back n steps lands on the cycle, unless the chain ends at a currency never relaxed
+        node = dest_curr
+        for _ in range(n):
+            if pre[node] == -1:
+                break
+            node = pre[node]
+        if pre[node] == -1:
+            continue
+        cycle = [node]
+        while pre[cycle[-1]] != node:
+            cycle.append(pre[cycle[-1]])
+        cycle = cycle[::-1]
+
+        start = cycle.index(min(cycle))
+        cycle_path = [int(p) for p in cycle[start:] + cycle[:start]]
+        cycle_path.append(cycle_path[0])
+        if cycle_path not in cycles:
+            cycles.append(cycle_path)
+
+    return cycles
+
+
+def detect_arbitrage(currency_tuple: tuple, rates_matrix: Tuple[Tuple[float, ...]],
+                     threshold_bps: float = 1.0, kernel: str = 'int64') -> List[List[int]]:
+    ''' Cycles that make at least threshold_bps, like arbitrage() returns them.
+    Cycles under the threshold lose their worst edge and the search runs again, so they can't hide better ones.'''
+
+    rates = np.asarray(rates_matrix, dtype=np.float64)
+    weights = weight_matrix(rates, kernel)
+    no_edge = INT_INF if kernel == 'int64' else np.inf
+
+    arbitrage_paths = []
+    while True:
+        weak_cycles = []
+        for cycle_path in negative_cycles(weights):
+            if cycle_path in arbitrage_paths:
+                continue
+            # whatever the kernel, the cycle is judged in float64 from the raw rates
+            profit = cycle_profit_bps(rates, cycle_path)
+            if profit >= threshold_bps:
+                arbitrage_paths.append(cycle_path)
+                print(f"Arbitrage Opportunity ({profit:.2f} bps): \n{' --> '.join([currency_tuple[p] for p in cycle_path])}")
+            else:
+                weak_cycles.append(cycle_path)
+
+        if not weak_cycles:
+            return arbitrage_paths
+
+        for cycle_path in weak_cycles:
+            # the worst rate on the cycle is the edge least likely to be part of a profitable one
+            legs = rates[cycle_path[:-1], cycle_path[1:]]
+            worst = int(np.argmin(legs))
+            weights[cycle_path[worst], cycle_path[worst + 1]] = no_edge
+
+
+if __name__ == "__main__":
+    currencies = ('USD', 'EUR', 'GBP', 'JPY')
+    # exchange_rates3 from _arbitrage_example_1.py, plus the same market with rounding noise on the quotes
+    parity = np.ones((4, 4))
+    noisy_parity = parity + np.random.default_rng(0).uniform(-1e-12, 1e-12, (4, 4))
+    # exchange_rates2 from _arbitrage_example_1.py, EUR -> GBP -> EUR makes 20%
+    presentation = [
+        [1, 0.9, 1, 1],
+        [1, 1, 1.2, 1],
+        [1.1, 1, 1, 1],
+        [1, 1, 1, 1],
+    ]
+
+    # three legs of 0.5 bps each: no single leg beats 1 bps, the cycle as a whole makes 1.5 bps
+    small_legs = np.ones((4, 4))
+    small_legs[0, 1] = small_legs[1, 2] = small_legs[2, 0] = 1.00005
+
+    # A -> B -> A makes 0.8 bps and hides A -> C -> D -> ... -> K -> A, ten legs making 2.0 bps together
+    shadow_currencies = tuple('ABCDEFGHIJK')
+    shadowed = np.ones((11, 11))
+    shadowed[0, 1] = shadowed[1, 0] = 1.00004
+    ten_legs = [0, 2, 3, 4, 5, 6, 7, 8, 9, 10, 0]
+    shadowed[ten_legs[:-1], ten_legs[1:]] = 1.00002
+
+    markets = (('parity', currencies, parity), ('noisy parity', currencies, noisy_parity),
+               ('presentation', currencies, presentation), ('small legs', currencies, small_legs),
+               ('shadowed', shadow_currencies, shadowed))
+    for kernel in KERNELS:
+        print(f"--- {kernel} ---")
+        for name, market_currencies, rates in markets:
+            paths = detect_arbitrage(market_currencies, rates, threshold_bps=1.0, kernel=kernel)
+            print(f"{name}: {len(paths)} cycle(s)")
+
+    # same random market in every kernel, to compare the speed
+    num_currencies = 500
+    rng = np.random.default_rng(0)
+    values = rng.uniform(0.5, 2, num_currencies)
+    random_rates = values[None, :] / values[:, None] * rng.uniform(0.999, 1.0001, (num_currencies, num_currencies))
+    random_currencies = tuple(str(i) for i in range(num_currencies))
+    for kernel in KERNELS:
+        start_time = time.time()
+        paths = detect_arbitrage(random_currencies, random_rates, threshold_bps=5.0, kernel=kernel)
+        print(f"{kernel}: {len(paths)} cycle(s) in {time.time() - start_time:.6f} seconds")